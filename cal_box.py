@@ -1,29 +1,86 @@
 import os
 import sys
+import tempfile
+import json
+import struct
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pyvista as pv
+from vtkmodules.vtkIOGeometry import vtkSTLReader
 
 # --- PythonOCC 관련 모듈 ---
 from OCC.Core.STEPControl import STEPControl_Reader
 from OCC.Core.IFSelect import IFSelect_RetDone
-from OCC.Core.TopoDS import topods_Face
+from OCC.Core.TopoDS import TopoDS_Shape, topods_Face
+from OCC.Core.BinTools import BinTools
 from OCC.Core.TopExp import TopExp_Explorer
-from OCC.Core.TopAbs import TopAbs_FACE
-from OCC.Extend.DataExchange import write_stl_file
+from OCC.Core.TopAbs import TopAbs_FACE, TopAbs_REVERSED
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Core.BRep import BRep_Tool
+from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
 
 from OCC.Core.Bnd import Bnd_Box
 from OCC.Core.BRepBndLib import brepbndlib_Add
 
 
-def compute_bbox_volume(step_filename: str):
-    """STEP 파일 전체의 Axis‑Aligned Bounding Box와 그 부피를 반환합니다."""
+def _write_brep_cache(shape, cache):
+    """
+    임시 파일에 BRep 을 다 쓴 뒤 os.replace 로 교체해, 중단되거나 동시에 쓰여도
+    잘린 캐시가 남지 않게 합니다. 읽기 전용 디렉터리 등에서는 캐시 없이 넘어갑니다.
+    """
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(cache) + ".", suffix=".tmp",
+                                   dir=os.path.dirname(cache) or ".")
+    except OSError:
+        return
+    os.close(fd)
+    try:
+        if BinTools.Write(shape, tmp):
+            os.replace(tmp, cache)
+    except Exception:               # OSError, Standard_Failure (RuntimeError) — 결과에는 영향 없음
+        pass
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def read_step_shape(step_filename: str):
+    """
+    STEP 파일을 한 번만 파싱하여 TopoDS_Shape 로 반환합니다.
+    첫 파싱 결과는 step_filename + ".brep" (OCC binary BRep) 로 저장해 두고,
+    STEP 파일보다 새로운 캐시가 있으면 STEP 파싱 없이 캐시를 읽습니다.
+    """
+    cache = step_filename + ".brep"
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(step_filename):
+        shape = TopoDS_Shape()
+        try:
+            if BinTools.Read(shape, cache):
+                return shape
+        except Exception:           # 깨진 캐시 → STEP 을 다시 파싱해 덮어씀
+            pass
+
     reader = STEPControl_Reader()
     if reader.ReadFile(step_filename) != IFSelect_RetDone:
         raise RuntimeError(f"STEP 파일 읽기 실패: {step_filename}")
 
     reader.TransferRoots()
     shape = reader.Shape()
+    _write_brep_cache(shape, cache)
+    return shape
+
+def read_step_shapes(step_filenames: list, max_workers=None) -> list:
+    """
+    여러 STEP 파일을 ThreadPoolExecutor 로 동시에 읽어
+    입력 순서대로 TopoDS_Shape 리스트를 반환합니다.
+    """
+    if len(step_filenames) == 1:
+        return [read_step_shape(step_filenames[0])]
 
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(read_step_shape, step_filenames))
+
+def compute_bbox_volume(shape):
+    """Shape 전체의 Axis‑Aligned Bounding Box와 그 부피를 반환합니다."""
     bbox = Bnd_Box()
     # tolerance=True 로 디노이즈된 box, triangulate=False (정밀)
     brepbndlib_Add(shape, bbox, True)
@@ -33,104 +90,153 @@ def compute_bbox_volume(step_filename: str):
     volume = dx * dy * dz
     return (xmin, ymin, zmin, xmax, ymax, zmax, volume)
 
-def export_step_faces_to_stl(step_filename: str, out_dir: str = "faces_out") -> list:
+# binary STL 삼각형 레코드 (50 byte): 법선, 꼭짓점 3개, attribute
+_STL_RECORD = np.dtype([("normal", "<f4", 3), ("vertices", "<f4", (3, 3)), ("attr", "<u2")])
+
+def export_step_faces_to_stl(shape, out_dir: str = "faces_out"):
     """
-    STEP 파일에서 Face(면)를 하나씩 추출하여, 
-    out_dir 디렉터리에 face_0.stl, face_1.stl, ... 형태로 저장합니다.
-    저장된 STL 파일들의 경로 리스트를 반환합니다.
+    이미 읽어 둔 Shape 의 모든 Face(면)를 out_dir/faces.stl 하나의 binary STL 로 저장하고,
+    면별 삼각형 범위 {face_i: (start_tri, n_tri)} 를 out_dir/faces.json 으로 저장합니다.
+    (STL 경로, 면별 (start_tri, n_tri) 리스트) 를 반환합니다.
     """
-    reader = STEPControl_Reader()
-    status = reader.ReadFile(step_filename)
-    if status != IFSelect_RetDone:
-        raise RuntimeError(f"STEP 파일을 읽는 데 실패했습니다: {step_filename}")
-
-    # STEP 파일을 Shape 객체로 변환
-    reader.TransferRoots()
-    shape = reader.Shape()
-
     # 출력 디렉터리 생성
     os.makedirs(out_dir, exist_ok=True)
 
-    # STEP 파일 내 모든 Face를 순회하여 개별 STL 파일로 저장
+    # Shape 전체를 한 번만 메싱 (공유 Edge 도 한 번만 분할됨).
+    # 면별 삼각형은 이 삼각분할을 그대로 읽어 쓰므로 면마다 다시 메싱하지 않습니다.
+    BRepMesh_IncrementalMesh(shape, 0.9, False, 0.5, True)
+
+    faces = []
     exp = TopExp_Explorer(shape, TopAbs_FACE)
-    face_index = 0
-    out_filenames = []
     while exp.More():
-        face = topods_Face(exp.Current())
-        out_filename = os.path.join(out_dir, f"face_{face_index}.stl")
-        write_stl_file(face, out_filename)
-        out_filenames.append(out_filename)
-        print(f"{out_filename} 저장 완료.")
-        face_index += 1
+        faces.append(topods_Face(exp.Current()))
         exp.Next()
 
-    return out_filenames
+    stl_path = os.path.join(out_dir, "faces.stl")
+    face_ranges = []
+    total = 0
+    # 레코드 생성은 스레드 풀에서, 쓰기는 면 순서대로 한 파일에 이어서
+    with open(stl_path, "wb") as fh, ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        fh.write(b"binary STL".ljust(80, b"\0"))
+        fh.write(struct.pack("<I", 0))          # 삼각형 수 자리, 마지막에 채움
+        for records in pool.map(_face_stl_records, faces):
+            fh.write(records.tobytes())
+            face_ranges.append((total, len(records)))
+            total += len(records)
+        fh.seek(80)
+        fh.write(struct.pack("<I", total))
+
+    with open(os.path.join(out_dir, "faces.json"), "w") as fh:
+        json.dump({f"face_{i}": r for i, r in enumerate(face_ranges)}, fh)
+
+    print(f"{stl_path} 저장 완료. (면 {len(faces)}개, 삼각형 {total}개)")
+    return stl_path, face_ranges
+
+def _face_stl_records(face) -> np.ndarray:
+    """Face 에 캐시된 삼각분할을 binary STL 레코드 배열로 변환합니다 (재메싱 없음)."""
+    loc = TopLoc_Location()
+    tri = BRep_Tool.Triangulation(face, loc)
+    if tri is None:
+        return np.empty(0, _STL_RECORD)
+
+    trsf = loc.Transformation()
+    nodes = np.empty((tri.NbNodes(), 3))
+    for i in range(tri.NbNodes()):
+        p = tri.Node(i + 1).Transformed(trsf)
+        nodes[i] = (p.X(), p.Y(), p.Z())
+    idx = np.array([tri.Triangle(i + 1).Get() for i in range(tri.NbTriangles())],
+                   np.int64).reshape(-1, 3) - 1
+    if face.Orientation() == TopAbs_REVERSED:
+        idx = idx[:, [0, 2, 1]]
 
-def load_and_view_faces(stl_files: list):
+    verts = nodes[idx]
+    normal = np.cross(verts[:, 1] - verts[:, 0], verts[:, 2] - verts[:, 0])
+    length = np.linalg.norm(normal, axis=1, keepdims=True)
+    records = np.zeros(len(idx), _STL_RECORD)
+    records["normal"] = np.divide(normal, length, out=np.zeros_like(normal), where=length > 0)
+    records["vertices"] = verts
+    return records
+
+def load_and_view_faces(stl_file: str, face_ranges: list):
     """
-    추출된 STL 파일들을 PyVista로 로딩하여 3D 뷰어를 띄웁니다.
+    export_step_faces_to_stl 이 저장한 STL 을 PyVista로 로딩하여 3D 뷰어를 띄웁니다.
     마우스 클릭 시, 해당 면만 파란색(불투명, Depth Test 해제, 에지 비활성화)으로 하이라이트되고,
     이전 선택은 원래 상태로 복구됩니다.
     """
-    if not stl_files:
-        print("STL 파일이 없습니다.")
+    if not face_ranges:
+        print("면이 없습니다.")
         return
 
     plotter = pv.Plotter()
 
-    # 각 STL 파일을 읽어 pickable한 메쉬로 추가합니다.
-    for stl_file in stl_files:
-        mesh = pv.read(stl_file)
-        plotter.add_mesh(
-            mesh,
-            show_edges=True,
-            pickable=True,
-            name=stl_file  # 이름은 파일명을 사용
-        )
+    # 통합 STL 을 한 번에 읽고, 면별 삼각형 범위로 CellData "face_id" 를 붙입니다.
+    # (점 병합을 끄면 퇴화 삼각형도 버려지지 않아 삼각형 순서/개수가 파일과 같음)
+    reader = vtkSTLReader()
+    reader.SetFileName(stl_file)
+    reader.MergingOff()
+    reader.Update()
+    mesh = pv.wrap(reader.GetOutput())
+    counts = [n_tri for _, n_tri in face_ranges]
+    mesh.cell_data["face_id"] = np.repeat(np.arange(len(face_ranges), dtype=np.int32), counts)
+
+    plotter.add_mesh(
+        mesh,
+        show_edges=True,
+        pickable=True,
+        name="faces"
+    )
 
     # 하이라이트를 위해 추가된 메쉬를 관리할 고정 actor 이름
     highlight_actor_name = "highlight_actor"
 
-    def mesh_pick_callback(picked_mesh):
+    def cell_pick_callback(picked_cells):
         # 이전에 하이라이트된 actor 제거
         try:
             plotter.remove_actor(highlight_actor_name)
         except Exception:
             pass
 
-        # 새로 선택된 면이 있으면 파란색으로 하이라이트 추가 (에지는 보이지 않도록 설정)
-        if picked_mesh is not None:
+        # 여러 actor 에 걸친 영역 선택이면 MultiBlock 으로 오므로 하나로 합침
+        if isinstance(picked_cells, pv.MultiBlock):
+            picked_cells = picked_cells.combine()
+
+        # 선택된 셀이 속한 면(face_id) 전체를 파란색으로 하이라이트 (에지는 보이지 않도록 설정)
+        if picked_cells is not None and picked_cells.n_cells > 0:
+            face_id = picked_cells.cell_data["face_id"][0]
+            picked_face = mesh.extract_cells(np.flatnonzero(mesh.cell_data["face_id"] == face_id))
             actor = plotter.add_mesh(
-                picked_mesh,
+                picked_face,
                 color='blue',       # 하이라이트 색상을 파란색으로 변경
                 opacity=1.0,        # 완전 불투명
                 show_edges=False,   # 에지(선) 비활성화
+                pickable=False,     # 다음 선택에 하이라이트 자체가 잡히지 않도록
                 name=highlight_actor_name
             )
             # Depth Test를 비활성화하여 항상 최상단에 표시되도록 함
             actor.GetProperty().SetDepthTest(False)
-            print("선택된 면이 파란색으로 하이라이트되었습니다.")
+            print(f"선택된 면(face_{face_id})이 파란색으로 하이라이트되었습니다.")
         else:
             print("메쉬가 선택되지 않았습니다.")
 
-    # 메쉬 피킹 활성화 (한 번에 하나의 메쉬만 선택)
-    plotter.enable_mesh_picking(
-        callback=mesh_pick_callback,
-        show_message=True,
-        multi=False
+    # 셀 피킹 활성화 (보이는 셀만 선택, 선택 셀 자체는 따로 그리지 않음)
+    plotter.enable_cell_picking(
+        callback=cell_pick_callback,
+        through=False,
+        show=False,
+        show_message=True
     )
 
-    print("[안내] 3D 창에서 마우스 왼쪽 드래그로 회전, 휠로 줌, 'P' 키로 픽 모드를 토글할 수 있습니다.")
+    print("[안내] 3D 창에서 마우스 왼쪽 드래그로 회전, 휠로 줌, 'R' 키 후 클릭/드래그로 면을 선택할 수 있습니다.")
     plotter.show()
 
 def main():
     parser = argparse.ArgumentParser(
         description="STEP 파일의 Bounding‑Box 부피 계산 + 단위 변환"
     )
-    parser.add_argument("--step", type=str, default="test.STEP",
-                        help="대상 STEP 파일 경로")
+    parser.add_argument("--step", type=str, nargs="+", default=["test.STEP"],
+                        help="대상 STEP 파일 경로 (여러 개 지정 가능)")
     parser.add_argument("--out", type=str, default="faces_out",
-                        help="면별 STL을 저장할 디렉터리")
+                        help="면 STL(faces.stl)과 면별 범위(faces.json)를 저장할 디렉터리")
     parser.add_argument(
         "--unit",
         choices=["mm3", "cm3", "m3"],
@@ -144,21 +250,25 @@ def main():
     # 2️⃣ 단위 환산 계수
     scale = {"mm3": 1.0, "cm3": 1.0 / 1_000, "m3": 1.0 / 1_000_000_000}[args.unit]
 
-    step_file = args.step
-    if not os.path.exists(step_file):
-        print(f"입력 STEP 파일이 존재하지 않습니다: {step_file}")
-        sys.exit(1)
-
-    # 3️⃣ Bounding‑Box 부피 계산
-    xmin, ymin, zmin, xmax, ymax, zmax, vol_mm3 = compute_bbox_volume(step_file)
-    vol_conv = vol_mm3 * scale
-
-    # 4️⃣ 결과 표시
-    print("\n[Bounding Box]")
-    print(f"  x: {xmin:.3f} – {xmax:.3f}")
-    print(f"  y: {ymin:.3f} – {ymax:.3f}")
-    print(f"  z: {zmin:.3f} – {zmax:.3f}")
-    print(f"  Volume: {vol_conv:.6f} {args.unit}")
+    for step_file in args.step:
+        if not os.path.exists(step_file):
+            print(f"입력 STEP 파일이 존재하지 않습니다: {step_file}")
+            sys.exit(1)
+
+    # 3️⃣ STEP 파싱은 파일당 한 번만 수행하고 Shape 을 재사용
+    shapes = read_step_shapes(args.step)
+
+    for step_file, shape in zip(args.step, shapes):
+        # 4️⃣ Bounding‑Box 부피 계산
+        xmin, ymin, zmin, xmax, ymax, zmax, vol_mm3 = compute_bbox_volume(shape)
+        vol_conv = vol_mm3 * scale
+
+        # 5️⃣ 결과 표시
+        print(f"\n[Bounding Box] {step_file}")
+        print(f"  x: {xmin:.3f} – {xmax:.3f}")
+        print(f"  y: {ymin:.3f} – {ymax:.3f}")
+        print(f"  z: {zmin:.3f} – {zmax:.3f}")
+        print(f"  Volume: {vol_conv:.6f} {args.unit}")
 
 
 if __name__ == "__main__":
@@ -7,31 +7,98 @@ Hybrid STEP volume calculator:
 
 Requirements:
     pip install pythonocc-core pyvista numpy
+    pip install numba            # (optional) JIT voxel rasterizer
+    voxel_kernels_build.py       # (optional) AOT-compiled rasterizer for hosts without numba
+    voxel_raster.cpp             # (optional) C++ rasterizer, build command in file header
+    pip install cupy-cuda12x     # (optional) CUDA interior fill for --gpu
 """
 
 import os, sys, argparse, tempfile
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pyvista as pv
 
+try:                        # numba 는 선택 사항 — 없으면 NumPy 래스터라이저로 동작
+    import numba
+except ImportError:
+    numba = None
+
+try:                        # voxel_raster.cpp 를 빌드해 둔 경우 (선택, numba 보다 우선)
+    import voxel_raster
+except ImportError:
+    voxel_raster = None
+
+# voxel_kernels_build.py 로 AOT 컴파일해 둔 커널은 단일 스레드이므로 numba 가 없을 때만 사용
+voxel_kernels = None
+if numba is None:
+    try:
+        import voxel_kernels
+    except ImportError:
+        pass
+
 # --- pythonOCC core ---
 from OCC.Core.STEPControl import STEPControl_Reader
 from OCC.Core.IFSelect import IFSelect_RetDone
 from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_Sewing, BRepBuilderAPI_MakeSolid
 from OCC.Core.TopExp import TopExp_Explorer
-from OCC.Core.TopAbs import TopAbs_SOLID, TopAbs_SHELL
+from OCC.Core.TopAbs import TopAbs_SOLID, TopAbs_SHELL, TopAbs_FACE, TopAbs_REVERSED
+from OCC.Core.TopoDS import TopoDS_Shape, topods_Face
+from OCC.Core.BinTools import BinTools
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Core.BRep import BRep_Tool
+from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
 from OCC.Core.GProp import GProp_GProps
 from OCC.Core.BRepGProp import brepgprop_VolumeProperties
 from OCC.Core.Bnd import Bnd_Box
 from OCC.Core.BRepBndLib import brepbndlib_Add
-from OCC.Extend.DataExchange import write_stl_file
+
+# --- VTK (GPU slice classification) ---
+from vtkmodules.vtkCommonDataModel import vtkPlane
+from vtkmodules.vtkRenderingCore import vtkWindowToImageFilter
+from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
 
 # ---------- helpers ----------
+def _write_brep_cache(shape, cache):
+    """
+    임시 파일에 BRep 을 다 쓴 뒤 os.replace 로 교체해, 중단되거나 동시에 쓰여도
+    잘린 캐시가 남지 않게 합니다. 읽기 전용 디렉터리 등에서는 캐시 없이 넘어갑니다.
+    """
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(cache) + ".", suffix=".tmp",
+                                   dir=os.path.dirname(cache) or ".")
+    except OSError:
+        return
+    os.close(fd)
+    try:
+        if BinTools.Write(shape, tmp):
+            os.replace(tmp, cache)
+    except Exception:               # OSError, Standard_Failure (RuntimeError) — 결과에는 영향 없음
+        pass
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
 def read_step_shape(path):
+    """
+    STEP → TopoDS_Shape. 첫 파싱 결과를 path + ".brep" (OCC binary BRep) 로 저장해 두고,
+    STEP 보다 새로운 캐시가 있으면 STEP 파싱 없이 캐시를 읽습니다.
+    """
+    cache = path + ".brep"
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+        shape = TopoDS_Shape()
+        try:
+            if BinTools.Read(shape, cache):
+                return shape
+        except Exception:           # 깨진 캐시 → STEP 을 다시 파싱해 덮어씀
+            pass
+
     rdr = STEPControl_Reader()
     if rdr.ReadFile(path) != IFSelect_RetDone:
         raise RuntimeError(f"STEP read failed: {path}")
     rdr.TransferRoots()
-    return rdr.Shape()
+    shape = rdr.Shape()
+    _write_brep_cache(shape, cache)
+    return shape
 
 
 def sewing_to_solids(shape, tol=0.05):
@@ -66,17 +133,19 @@ def sewing_to_solids(shape, tol=0.05):
 
     return solids
 
-def solids_volume(solids, unit_scale=1.0):
-    """Return list[(id, vol_mm3, COM)], and total."""
-    results, total = [], 0.0
-    for idx, solid in enumerate(solids):
+def solids_volume(solids, unit_scale=1.0, with_com=False):
+    """Return volumes (n,), COMs (n, 3) or None unless with_com, and total."""
+    vols = np.empty(len(solids))
+    coms = np.empty((len(solids), 3)) if with_com else None
+    for i, solid in enumerate(solids):
         props = GProp_GProps()
         brepgprop_VolumeProperties(solid, props)
-        vm = props.Mass() * unit_scale
-        com = props.CentreOfMass()
-        results.append((idx, vm, (com.X(), com.Y(), com.Z())))
-        total += vm
-    return results, total
+        vols[i] = props.Mass()
+        if with_com:
+            c = props.CentreOfMass()
+            coms[i] = (c.X(), c.Y(), c.Z())
+    vols *= unit_scale
+    return vols, coms, vols.sum()
 
 def bbox_volume_mm3(shape):
     box = Bnd_Box()
@@ -84,22 +153,588 @@ def bbox_volume_mm3(shape):
     xmin, ymin, zmin, xmax, ymax, zmax = box.Get()
     return (xmin, ymin, zmin, xmax, ymax, zmax, (xmax-xmin)*(ymax-ymin)*(zmax-zmin))
 
-def shape_to_pv_mesh(shape):
-    """Quick path: write tmp STL then read via PyVista."""
-    with tempfile.TemporaryDirectory() as td:
-        tmp_stl = os.path.join(td, "t.stl")
-        write_stl_file(shape, tmp_stl)
-        mesh = pv.read(tmp_stl)
-    return mesh
+def shape_to_pv_mesh(shape, linear_deflection=0.9, angular_deflection=0.5):
+    """
+    Shape 을 한 번 테셀레이션한 뒤, 면별 Poly_Triangulation 을
+    NumPy 배열로 모아 PolyData 를 직접 만듭니다 (임시 STL 왕복 없음).
+    중복 꼭짓점은 clean 으로 병합해 Voxel 화 / 렌더링에 넘깁니다.
+    """
+    BRepMesh_IncrementalMesh(shape, linear_deflection, False, angular_deflection, True)
+
+    points, faces, offset = [], [], 0
+    exp = TopExp_Explorer(shape, TopAbs_FACE)
+    while exp.More():
+        face = topods_Face(exp.Current())
+        loc = TopLoc_Location()
+        tri = BRep_Tool.Triangulation(face, loc)
+        exp.Next()
+        if tri is None:
+            continue
+
+        trsf = loc.Transformation()
+        n_nodes, n_tris = tri.NbNodes(), tri.NbTriangles()
+        pts = np.empty((n_nodes, 3), np.float64)
+        for i in range(n_nodes):
+            p = tri.Node(i + 1).Transformed(trsf)
+            pts[i] = (p.X(), p.Y(), p.Z())
+
+        # VTK faces 포맷: [3, i0, i1, i2] (OCC 인덱스는 1부터 시작)
+        cells = np.empty((n_tris, 4), np.int64)
+        cells[:, 0] = 3
+        for i in range(n_tris):
+            cells[i, 1:] = tri.Triangle(i + 1).Get()
+        cells[:, 1:] += offset - 1
+        if face.Orientation() == TopAbs_REVERSED:
+            cells[:, [2, 3]] = cells[:, [3, 2]]
+
+        points.append(pts)
+        faces.append(cells)
+        offset += n_nodes
+
+    if not points:
+        return pv.PolyData()
+    mesh = pv.PolyData(np.concatenate(points), np.concatenate(faces).ravel())
+    # 면마다 따로 만든 경계 꼭짓점을 병합하고 퇴화 삼각형을 제거
+    # (기본값이면 퇴화 삼각형이 선/점으로 남아 --gpu 렌더링에서 층으로 세어짐)
+    return mesh.clean(tolerance=1e-6, polys_to_lines=False, lines_to_points=False)
+
+# ---------- voxel rasterizer ----------
+# pyvista 0.43 부터 UniformGrid → ImageData 로 이름이 바뀌었습니다.
+_ImageData = getattr(pv, "ImageData", None) or pv.UniformGrid
 
-def voxel_volume(mesh, pitch):
+# 격자와 정확히 겹치는 모서리/꼭짓점에서 parity 가 두 번 세지는 것을 막기 위한 미세 오프셋 (pitch 배수)
+_COLUMN_JITTER = np.array([0.3183099e-4, 0.2718282e-4])
+
+# 셀 면에 정확히 맞닿은 삼각형(bbox 최소면은 항상 그렇습니다)을
+# float64 / float32 백엔드 모두 똑같이 "겹침" 으로 판정하도록 박스를 아주 조금 키움
+_BOX_SLACK = 1.0 + 1e-4
+
+def _mesh_triangles(mesh):
+    """PolyData → (M, 3, 3) float64 삼각형 꼭짓점 배열."""
     tri = mesh.triangulate()
-    vox = tri.voxelize(density=pitch)
-    vol_mm3 = vox.n_cells * pitch**3
-    return vox, vol_mm3
+    faces = tri.faces.reshape(-1, 4)[:, 1:]
+    return np.asarray(tri.points, np.float64)[faces]
+
+_ALL_ONES = np.uint64(0xFFFF_FFFF_FFFF_FFFF)
+
+def _packed_zeros(dims):
+    """(nx, ny, nz) 점유 격자를 Z 방향 64셀 = uint64 1워드로 묶은 0 배열."""
+    nx, ny, nz = (int(d) for d in dims)
+    return np.zeros((nx, ny, (nz + 63) // 64), np.uint64)
+
+def _bit(k):
+    """Z 인덱스 k → 해당 워드 안의 비트 마스크."""
+    return np.left_shift(np.uint64(1), (np.asarray(k) & 63).astype(np.uint64))
+
+def _popcount(packed):
+    """packed 격자의 점유 셀 수."""
+    if hasattr(np, "bitwise_count"):               # NumPy 2.0+
+        return int(np.bitwise_count(packed).sum(dtype=np.int64))
+    return int(np.unpackbits(packed.astype("<u8").view(np.uint8)).sum(dtype=np.int64))
+
+def unpack_voxels(packed, nz):
+    """packed 격자를 (nx, ny, nz) uint8 격자로 풉니다 (표시용)."""
+    return np.unpackbits(packed.astype("<u8").view(np.uint8), axis=2, count=nz, bitorder="little")
+
+def _grid_spec(tris, pitch):
+    """전체 bbox 와 pitch 로부터 격자 원점과 (nx, ny, nz) 를 구합니다."""
+    lo = tris.reshape(-1, 3).min(0)
+    hi = tris.reshape(-1, 3).max(0)
+    dims = np.maximum(np.ceil((hi - lo) / pitch).astype(np.int64), 1)
+    return lo, dims
+
+def _batches(counts, budget=1 << 20):
+    """후보 셀 수 합이 budget 을 넘지 않도록 삼각형 구간 (start, stop) 을 나눕니다."""
+    csum = np.cumsum(counts)
+    start = 0
+    while start < len(counts):
+        base = csum[start - 1] if start else 0
+        stop = max(start + 1, int(np.searchsorted(csum, base + budget, side="right")))
+        yield start, stop
+        start = stop
+
+def _expand_boxes(lo, hi):
+    """
+    정수 AABB [lo, hi] (M, D) 를 셀 단위로 펼칩니다.
+    (삼각형 인덱스 (K,), 셀 좌표 (K, D)) 를 반환.
+    """
+    ext = np.maximum(hi - lo + 1, 0)
+    counts = ext.prod(1)
+    tid = np.repeat(np.arange(len(lo)), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cells = np.empty((len(tid), lo.shape[1]), np.int64)
+    for d in reversed(range(lo.shape[1])):
+        cells[:, d] = lo[tid, d] + local % ext[tid, d]
+        local //= ext[tid, d]
+    return tid, cells
+
+def _tri_box_overlap(v, half):
+    """
+    Triangle–box SAT (Akenine‑Möller) 를 K 개 후보에 대해 한 번에 검사합니다.
+    v: 박스 중심 기준 삼각형 꼭짓점 (K, 3, 3), half: 박스 반변 길이.
+    """
+    e = np.roll(v, -1, axis=1) - v                                   # e0, e1, e2
+    edge_axes = np.cross(e[:, :, None, :], np.eye(3)[None, None]).reshape(-1, 9, 3)
+    normal = np.cross(e[:, 0], e[:, 1])[:, None, :]
+    box_axes = np.broadcast_to(np.eye(3), (len(v), 3, 3))
+    axes = np.concatenate([box_axes, edge_axes, normal], axis=1)    # (K, 13, 3)
+
+    proj = np.einsum("kaj,kvj->kav", axes, v)
+    radius = half * np.abs(axes).sum(-1)
+    separated = (proj.min(-1) > radius) | (proj.max(-1) < -radius)
+    return ~separated.any(1)
+
+def _cell_bounds(tris, origin, pitch, dims):
+    """삼각형별 정수 AABB [lo, hi] (M, 3), 격자 범위로 잘라 반환."""
+    inv_pitch = 1.0 / pitch
+    lo = np.clip(np.floor((tris.min(1) - origin) * inv_pitch).astype(np.int64), 0, dims - 1)
+    hi = np.clip(np.floor((tris.max(1) - origin) * inv_pitch).astype(np.int64), 0, dims - 1)
+    return lo, hi
+
+def _surface_voxels(tris, origin, pitch, dims, packed):
+    """삼각형과 겹치는 모든 셀(표면 셸)의 비트를 packed 에 세웁니다."""
+    lo, hi = _cell_bounds(tris, origin, pitch, dims)
+    counts = (hi - lo + 1).prod(1)
+
+    # 후보 셀 하나당 13축 einsum/cross 임시 배열이 ~1 KB 이므로 배치를 작게 (~100 MB)
+    for a, b in _batches(counts, budget=1 << 16):
+        tid, cells = _expand_boxes(lo[a:b], hi[a:b])
+        centres = origin + (cells + 0.5) * pitch
+        hit = _tri_box_overlap(tris[a:b][tid] - centres[:, None, :], 0.5 * pitch * _BOX_SLACK)
+        ix, iy, iz = cells[hit].T
+        np.bitwise_or.at(packed, (ix, iy, iz >> 6), _bit(iz))
+
+# numba 가 없으면 아래 커널은 정의만 되고 호출되지 않습니다.
+_njit = numba.njit if numba else (lambda *a, **k: (lambda f: f))
+_prange = numba.prange if numba else range
+
+@_njit(cache=True)
+def _axis_separated(ax, ay, az, x0, y0, z0, x1, y1, z1, x2, y2, z2, half):
+    p0 = ax * x0 + ay * y0 + az * z0
+    p1 = ax * x1 + ay * y1 + az * z1
+    p2 = ax * x2 + ay * y2 + az * z2
+    r = half * (abs(ax) + abs(ay) + abs(az))
+    return min(p0, p1, p2) > r or max(p0, p1, p2) < -r
+
+@_njit(cache=True)
+def _tri_box_overlap_scalar(tri, cx, cy, cz, half):
+    """_tri_box_overlap 와 같은 13축 SAT 를 스칼라 한 쌍에 대해 수행."""
+    x0, y0, z0 = tri[0, 0] - cx, tri[0, 1] - cy, tri[0, 2] - cz
+    x1, y1, z1 = tri[1, 0] - cx, tri[1, 1] - cy, tri[1, 2] - cz
+    x2, y2, z2 = tri[2, 0] - cx, tri[2, 1] - cy, tri[2, 2] - cz
+    v = (x0, y0, z0, x1, y1, z1, x2, y2, z2, half)
+
+    # 박스 축 (AABB)
+    if _axis_separated(1.0, 0.0, 0.0, *v) or _axis_separated(0.0, 1.0, 0.0, *v) \
+            or _axis_separated(0.0, 0.0, 1.0, *v):
+        return False
+
+    # 모서리 × 박스 축 (9축)
+    for ex, ey, ez in ((x1 - x0, y1 - y0, z1 - z0),
+                       (x2 - x1, y2 - y1, z2 - z1),
+                       (x0 - x2, y0 - y2, z0 - z2)):
+        if _axis_separated(0.0, -ez, ey, *v) or _axis_separated(ez, 0.0, -ex, *v) \
+                or _axis_separated(-ey, ex, 0.0, *v):
+            return False
+
+    # 삼각형 평면 법선
+    ux, uy, uz = x1 - x0, y1 - y0, z1 - z0
+    wx, wy, wz = x2 - x1, y2 - y1, z2 - z1
+    return not _axis_separated(uy * wz - uz * wy, uz * wx - ux * wz, ux * wy - uy * wx, *v)
+
+@_njit(parallel=True, fastmath=True, cache=True)
+def _surface_voxels_nb(tris, lo, hi, order, offsets, origin, pitch, packed):
+    """
+    _surface_voxels 의 numba 버전: X 인덱스 단위 prange 병렬.
+    각 스레드가 packed[i] 행을 혼자 쓰므로 워드 OR 에 경합이 없습니다.
+    order[offsets[i]:offsets[i+1]] = X 범위에 i 가 포함되는 삼각형.
+    """
+    half = 0.5 * pitch * _BOX_SLACK
+    for i in _prange(packed.shape[0]):
+        cx = origin[0] + (i + 0.5) * pitch
+        for n in range(offsets[i], offsets[i + 1]):
+            t = order[n]
+            tri = tris[t]
+            for j in range(lo[t, 1], hi[t, 1] + 1):
+                cy = origin[1] + (j + 0.5) * pitch
+                for k in range(lo[t, 2], hi[t, 2] + 1):
+                    cz = origin[2] + (k + 0.5) * pitch
+                    if _tri_box_overlap_scalar(tri, cx, cy, cz, half):
+                        packed[i, j, k >> 6] |= np.uint64(1) << np.uint64(k & 63)
+
+def _surface_voxels_fast(tris, origin, pitch, dims, packed):
+    """
+    X 행별 삼각형 목록(CSR)을 만든 뒤 voxel_raster (C++), _surface_voxels_nb (numba JIT)
+    또는 voxel_kernels (AOT) 커널을 호출합니다.
+    """
+    lo, hi = _cell_bounds(tris, origin, pitch, dims)
+    counts = hi[:, 0] - lo[:, 0] + 1
+    tid = np.repeat(np.arange(len(tris)), counts)
+    rows = lo[tid, 0] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    order = tid[np.argsort(rows, kind="stable")]
+    offsets = np.zeros(int(dims[0]) + 1, np.int64)
+    offsets[1:] = np.cumsum(np.bincount(rows, minlength=int(dims[0])))
+    if voxel_raster:
+        rel = (tris - origin).astype(np.float32)
+        voxel_raster.rasterize_triangles(rel, lo, hi, order, offsets, pitch,
+                                         0.5 * pitch * _BOX_SLACK, packed)
+    elif numba:
+        _surface_voxels_nb(tris, lo, hi, order, offsets, origin, pitch, packed)
+    else:
+        voxel_kernels.surface_voxels(tris, lo, hi, order, offsets, origin, pitch, packed)
+
+def _fill_interior(tris, origin, pitch, dims, packed, parity=None, k0=0):
+    """
+    각 (i, j) 열의 셀 중심에서 +Z 방향 교차 횟수의 홀짝(parity)으로
+    내부 셀을 packed 에 채웁니다.
+    교차점 위 셀들의 비트를 뒤집는 연산을 워드 단위로 나눠,
+    같은 워드 안은 부분 마스크 XOR, 그 위 워드들은 누적 홀짝으로 처리합니다.
+
+    Z 청크 단위로 부를 때는 packed 가 전역 Z 인덱스 k0 부터의 nz 셀을 덮고
+    (origin 의 z 는 전역 격자 원점), parity (nx, ny) uint8 에 아래 청크까지의
+    교차 홀짝을 넘깁니다. 이 경우 k0 아래 교차는 이미 parity 에 있으므로 버리고,
+    반환 시 parity 를 이 청크 위쪽 경계의 홀짝으로 갱신합니다.
+    """
+    nx, ny, nz = (int(d) for d in dims)
+    nw = packed.shape[2]
+    e, f = tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0]
+    normal = np.cross(e, f)
+    t, n = tris[normal[:, 2] != 0], normal[normal[:, 2] != 0]   # XY 로 투영해 면적 0 인 삼각형 제외
+
+    inv_pitch = 1.0 / pitch
+    shift = origin[:2] + _COLUMN_JITTER * pitch
+    lo = np.ceil((t[:, :, :2].min(1) - shift) * inv_pitch - 0.5).astype(np.int64)
+    hi = np.floor((t[:, :, :2].max(1) - shift) * inv_pitch - 0.5).astype(np.int64)
+    lo, hi = np.maximum(lo, 0), np.minimum(hi, [nx - 1, ny - 1])
+    counts = np.maximum(hi - lo + 1, 0).prod(1)
+
+    partial = np.zeros((nx, ny, nw), np.uint64)
+    carry = np.zeros((nx, ny, nw + 1), np.uint8)
+    for a, b in _batches(counts):
+        tid, cols = _expand_boxes(lo[a:b], hi[a:b])
+        v, nrm = t[a:b][tid], n[a:b][tid]
+        xy = shift + (cols + 0.5) * pitch
+
+        # 2D edge function 으로 열 중심이 투영 삼각형 안에 있는지 판정
+        d = v[:, :, :2] - xy[:, None, :]
+        w = d[:, :, 0] * np.roll(d, -1, axis=1)[:, :, 1] - d[:, :, 1] * np.roll(d, -1, axis=1)[:, :, 0]
+        inside = (w > 0).all(1) | (w < 0).all(1)
+        v, nrm, cols, xy = v[inside], nrm[inside], cols[inside], xy[inside]
+
+        # 평면 n·(P - v0) = 0 에서 교차 z, 그 위로 첫 번째 셀 중심 인덱스
+        z = v[:, 0, 2] - (nrm[:, 0] * (xy[:, 0] - v[:, 0, 0]) + nrm[:, 1] * (xy[:, 1] - v[:, 0, 1])) / nrm[:, 2]
+        k = np.ceil((z - origin[2]) * inv_pitch - 0.5).astype(np.int64) - k0
+        if parity is None:
+            k = np.maximum(k, 0)
+        keep = (k >= 0) & (k < nz)
+        ci, cj, k = cols[keep, 0], cols[keep, 1], k[keep]
+        np.bitwise_xor.at(partial, (ci, cj, k >> 6), _ALL_ONES << (k & 63).astype(np.uint64))
+        np.add.at(carry, (ci, cj, (k >> 6) + 1), 1)
+
+    if parity is not None:                         # 아래 청크들의 교차는 열 전체를 뒤집음
+        carry[:, :, 0] += parity
+        parity[:] = carry.sum(2, dtype=np.int64) & 1
+    flip = (np.cumsum(carry, axis=2, dtype=np.uint8)[:, :, :nw] & 1).astype(bool)
+    packed |= np.where(flip, ~partial, partial)
+    if nz & 63:                                    # 마지막 워드의 nz 이후 비트 정리
+        packed[:, :, -1] &= (np.uint64(1) << np.uint64(nz & 63)) - np.uint64(1)
+
+# 겹친 층 수 n 에 대한 8bit 밝기 255·(1 - 0.5ⁿ); 0.5 불투명도 블렌딩은 그리는 순서와 무관
+_LAYER_LEVELS = 255.0 * (1.0 - 0.5 ** np.arange(9))
+
+def _fill_interior_gpu(mesh, origin, pitch, dims, packed):
+    """
+    _fill_interior 와 같은 +Z parity 판정을 VTK 오프스크린 렌더링으로 수행합니다.
+    슬라이스마다 z = 셀 중심 높이의 클리핑 평면(GPU 셰이더에서 처리)을 걸고
+    위에서 직교 투영으로 찍어, 픽셀(= 셀 열)마다 겹친 층 수의 홀짝을 읽습니다.
+    8bit 밝기로는 7층 이상을 구분할 수 없으므로, 그런 픽셀이 나오면 packed 를
+    건드리지 않고 False 를 반환합니다 (성공하면 True).
+    """
+    nx, ny, nz = (int(d) for d in dims)
+    p = pv.Plotter(off_screen=True, window_size=(int(nx), int(ny)))
+    p.disable_anti_aliasing()
+    p.ren_win.SetMultiSamples(0)
+    p.set_background("black")
+    actor = p.add_mesh(mesh, color="white", opacity=0.5, lighting=False, show_edges=False)
+
+    plane = vtkPlane()
+    plane.SetNormal(0.0, 0.0, 1.0)              # z ≥ 슬라이스 높이 쪽만 남김
+    actor.GetMapper().AddClippingPlane(plane)
+
+    # 픽셀 중심이 셀 열 중심 (ox + (i+0.5)·pitch, oy + (j+0.5)·pitch) 에 오도록 카메라 배치
+    cx, cy = origin[0] + 0.5 * nx * pitch, origin[1] + 0.5 * ny * pitch
+    ztop = origin[2] + (nz + 1) * pitch
+    cam = p.camera
+    cam.SetParallelProjection(True)
+    cam.SetParallelScale(0.5 * ny * pitch)
+    cam.SetPosition(cx, cy, ztop)
+    cam.SetFocalPoint(cx, cy, origin[2])
+    cam.SetViewUp(0.0, 1.0, 0.0)
+    cam.SetClippingRange(0.5 * pitch, (nz + 2) * pitch)
+
+    grab = vtkWindowToImageFilter()
+    grab.SetInput(p.ren_win)
+    grab.SetInputBufferTypeToRGB()
+    grab.ReadFrontBufferOff()
+
+    midpoints = 0.5 * (_LAYER_LEVELS[1:] + _LAYER_LEVELS[:-1])
+    inside = np.zeros_like(packed)
+    try:
+        for k in range(nz):
+            plane.SetOrigin(0.0, 0.0, origin[2] + (k + 0.5) * pitch)
+            p.ren_win.Render()
+            grab.Modified()
+            grab.Update()
+            red = vtk_to_numpy(grab.GetOutput().GetPointData().GetScalars())[:, 0]
+            layers = np.searchsorted(midpoints, red.reshape(ny, nx))   # 행 0 = 화면 아래 = j 0
+            if layers.max() >= 7:                   # 밝기 포화 → 홀짝을 믿을 수 없음
+                return False
+            inside[:, :, k >> 6] |= (layers & 1).T.astype(np.uint64) << np.uint64(k & 63)
+    finally:
+        p.close()
+    packed |= inside
+    return True
+
+# 스레드 1개 = 셀 열 (i, j) 1개, 블록 1개 = _CUDA_TILE² 열 타일
+_CUDA_TILE = 16
+
+_FILL_COLUMNS_SRC = r"""
+extern "C" __global__
+void fill_columns(const float* tris, const long long* order, const long long* offsets,
+                  int nx, int ny, int nz, int nw, unsigned long long* fill)
+{
+    const int i = blockIdx.x * blockDim.x + threadIdx.x;
+    const int j = blockIdx.y * blockDim.y + threadIdx.y;
+    if (i >= nx || j >= ny) return;
+
+    // 좌표는 "열 (i, j) 중심 = (i, j), 셀 k 중심 = k" 가 되도록 미리 변환되어 있음
+    const float px = (float)i, py = (float)j;
+    const long long tile = (long long)blockIdx.x * gridDim.y + blockIdx.y;
+    unsigned long long* col = fill + ((long long)i * ny + j) * nw;
+
+    for (long long n = offsets[tile]; n < offsets[tile + 1]; ++n) {
+        const float* v = tris + order[n] * 9;
+        const float dx0 = v[0] - px, dy0 = v[1] - py;
+        const float dx1 = v[3] - px, dy1 = v[4] - py;
+        const float dx2 = v[6] - px, dy2 = v[7] - py;
+
+        // 방향 +Z 의 Möller–Trumbore = 투영 삼각형의 2D edge function (무게중심 좌표)
+        const float w0 = dx0 * dy1 - dy0 * dx1;
+        const float w1 = dx1 * dy2 - dy1 * dx2;
+        const float w2 = dx2 * dy0 - dy2 * dx0;
+        if (!((w0 > 0 && w1 > 0 && w2 > 0) || (w0 < 0 && w1 < 0 && w2 < 0))) continue;
+
+        const float z = (w1 * v[2] + w2 * v[5] + w0 * v[8]) / (w0 + w1 + w2);
+        const int k = max((int)ceilf(z), 0);
+        if (k >= nz) continue;
+
+        // 교차점 위 셀 전부 뒤집기 (열을 이 스레드만 쓰므로 atomic 불필요)
+        col[k >> 6] ^= ~0ull << (k & 63);
+        for (int w = (k >> 6) + 1; w < nw; ++w) col[w] ^= ~0ull;
+    }
+}
+"""
+
+cp = None                   # --gpu 일 때만 _load_cupy() 가 채움 (시작 시간에 영향 없음)
+
+def _load_cupy():
+    """cupy 를 처음 필요할 때 가져옵니다. 없거나 CUDA 장치가 없으면 None."""
+    global cp
+    if cp is None:
+        try:
+            import cupy
+            if cupy.cuda.runtime.getDeviceCount() > 0:
+                cp = cupy
+        except Exception:           # ImportError, 드라이버/장치 없음 (CUDARuntimeError)
+            pass
+    return cp
+
+_cuda_kernels = {}
+
+def _cuda_kernel(name):
+    """RawKernel 은 첫 호출 때 한 번만 컴파일합니다 (cupy 가 디스크에도 캐시)."""
+    if name not in _cuda_kernels:
+        _cuda_kernels[name] = (
+            cp.RawKernel(_FILL_COLUMNS_SRC, name) if name == "fill_columns" else
+            cp.ReductionKernel("uint64 x", "int64 y", "__popcll(x)", "a + b", "y = a", "0", name))
+    return _cuda_kernels[name]
+
+def _fill_interior_cuda(tris, origin, pitch, dims, packed, copy_back=True):
+    """
+    _fill_interior 와 같은 +Z parity 판정을 CUDA 커널(cupy)로 수행합니다.
+    삼각형을 XY 타일별 CSR 로 묶어 float32 로 한 번 올리고, 표면 셸(packed) 과
+    합친 격자와 점유 셀 수는 장치 메모리에서 계산합니다.
+    copy_back=True 이면 결과를 packed 에 되돌려 씁니다. 점유 셀 수를 반환.
+    """
+    nx, ny, nz = (int(d) for d in dims)
+    nw = packed.shape[2]
+    normal_z = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])[:, 2]
+    t = tris[normal_z != 0]                  # XY 로 투영해 면적 0 인 삼각형 제외
+
+    # 열 중심이 정수 좌표가 되도록 변환 (float32 에서도 격자 근처 값이 작게 유지됨)
+    shift = np.append(origin[:2] + _COLUMN_JITTER * pitch, origin[2])
+    rel = (t - shift) / pitch - 0.5
+
+    # 타일 공간 해시: 삼각형 XY AABB 가 걸치는 타일마다 등록
+    tiles = -(-np.array([nx, ny]) // _CUDA_TILE)
+    lo = np.clip(np.ceil(rel[:, :, :2].min(1)).astype(np.int64), 0, [nx - 1, ny - 1]) // _CUDA_TILE
+    hi = np.clip(np.floor(rel[:, :, :2].max(1)).astype(np.int64), 0, [nx - 1, ny - 1]) // _CUDA_TILE
+    tid, keys = _expand_boxes(lo, hi)
+    key = keys[:, 0] * tiles[1] + keys[:, 1]
+    order = tid[np.argsort(key, kind="stable")]
+    offsets = np.zeros(int(tiles.prod()) + 1, np.int64)
+    offsets[1:] = np.cumsum(np.bincount(key, minlength=int(tiles.prod())))
+
+    fill = cp.zeros((nx, ny, nw), cp.uint64)
+    _cuda_kernel("fill_columns")(
+        (int(tiles[0]), int(tiles[1])), (_CUDA_TILE, _CUDA_TILE),
+        (cp.asarray(rel, cp.float32), cp.asarray(order), cp.asarray(offsets),
+         np.int32(nx), np.int32(ny), np.int32(nz), np.int32(nw), fill))
+    if nz & 63:                                    # 마지막 워드의 nz 이후 비트 정리
+        fill[:, :, -1] &= np.uint64((1 << (nz & 63)) - 1)
+
+    grid = cp.asarray(packed)
+    grid |= fill
+    if copy_back:
+        grid.get(out=packed)
+    return int(_cuda_kernel("popcount")(grid.ravel()))
+
+# 청크 한 변의 셀 수 (64 의 배수여야 packed 워드 경계와 맞음)
+_CHUNK = 128
+
+def _rasterize_surface(tris, origin, pitch, dims, packed):
+    if voxel_raster or voxel_kernels or numba:
+        _surface_voxels_fast(tris, origin, pitch, dims, packed)
+    else:
+        _surface_voxels(tris, origin, pitch, dims, packed)
+
+def _group_by_key(keys, tid):
+    """정렬 후 같은 key 끼리 묶은 {key: 삼각형 인덱스 배열}."""
+    order = np.argsort(keys, kind="stable")
+    keys, tid = keys[order], tid[order]
+    uniq, starts = np.unique(keys, return_index=True)
+    return dict(zip(uniq.tolist(), np.split(tid, starts[1:])))
+
+def _chunk_index(tris, origin, pitch, dims):
+    """
+    삼각형 AABB 로 청크 공간 해시를 만듭니다.
+    surf: (cx, cy, cz) → 그 청크와 AABB 가 겹치는 삼각형 (표면 셸용)
+    cols: (cx, cy)     → 그 XY 청크 열과 겹치는 삼각형 (+Z parity 용)
+    fzlo, fzhi: 삼각형의 교차가 뒤집기 시작할 수 있는 Z 청크 범위
+    (교차 위 첫 셀 중심은 AABB 셀 범위 [lo, hi + 1] 안에 있음)
+    """
+    lo, hi = _cell_bounds(tris, origin, pitch, dims)
+    clo, chi = lo // _CHUNK, hi // _CHUNK
+    n = -(-dims // _CHUNK)
+
+    tid, keys = _expand_boxes(clo, chi)
+    surf = _group_by_key((keys[:, 0] * n[1] + keys[:, 1]) * n[2] + keys[:, 2], tid)
+    tid, keys = _expand_boxes(clo[:, :2], chi[:, :2])
+    cols = _group_by_key(keys[:, 0] * n[1] + keys[:, 1], tid)
+    return n, clo[:, 2], np.minimum((hi[:, 2] + 1) // _CHUNK, n[2] - 1), surf, cols
+
+def _voxelize_chunk(tris, origin, pitch, c0, cdims, surf_ids, fill_ids, parity):
+    """청크 하나를 자체 packed 격자에 래스터화해 반환합니다 (parity 는 제자리 갱신)."""
+    packed = _packed_zeros(cdims)
+    _rasterize_surface(tris[surf_ids], origin + c0 * pitch, pitch, cdims, packed)
+    # parity 는 전역 Z 인덱스로 판정해야 청크 경계의 교차가 정확히 한 청크에만 속함
+    fill_origin = origin + np.array([c0[0], c0[1], 0]) * pitch
+    _fill_interior(tris[fill_ids], fill_origin, pitch, cdims, packed, parity, int(c0[2]))
+    return packed
+
+def voxel_volume(mesh, pitch, gpu=False, keep_grid=True):
+    """
+    표면 셸(SAT) + 내부(parity) 를 Z 방향 비트 패킹 uint64 격자로 래스터화합니다.
+    CPU 경로는 격자를 _CHUNK³ 청크로 나눠, XY 청크 열마다 아래에서 위로 청크와
+    겹치는 삼각형만 래스터화하고 (열별 parity 는 위 청크로 넘김) 셀 수를 센 뒤 청크를 버립니다
+    (최대 메모리 ≈ 작업 스레드 수 × (청크 + 배치 임시 배열 ~100 MB)).
+    keep_grid=False 이면 전체 격자를 만들지 않고 packed 는 None 입니다.
+    gpu=True 이면 내부 판정을 전체 격자에 대해 GPU 로 수행합니다
+    (cupy 와 CUDA 장치가 있으면 CUDA 커널, 없으면 VTK 오프스크린 렌더링).
+    (packed, origin, dims, vol_mm3) 를 반환.
+    """
+    tris = _mesh_triangles(mesh)
+    origin, dims = _grid_spec(tris, pitch)
+    cell_vol = pitch * pitch * pitch
+
+    if gpu:
+        packed = _packed_zeros(dims)
+        _rasterize_surface(tris, origin, pitch, dims, packed)
+        if _load_cupy() is not None:
+            cells = _fill_interior_cuda(tris, origin, pitch, dims, packed, copy_back=keep_grid)
+            return (packed if keep_grid else None), origin, dims, cells * cell_vol
+        if not _fill_interior_gpu(mesh, origin, pitch, dims, packed):
+            print("[WARN] GPU slice saturated (≥7 layers per pixel); "
+                  "falling back to CPU parity fill", file=sys.stderr)
+            _fill_interior(tris, origin, pitch, dims, packed)
+        return packed, origin, dims, _popcount(packed) * cell_vol
+
+    n, fzlo, fzhi, surf, cols = _chunk_index(tris, origin, pitch, dims)
+    packed = _packed_zeros(dims) if keep_grid else None
+    empty = np.empty(0, np.int64)
+
+    def run(c):
+        cx, cy = divmod(c, int(n[1]))
+        col = cols[c]
+        c0 = np.array([cx, cy, 0]) * _CHUNK
+        nxy = np.minimum(c0[:2] + _CHUNK, dims[:2]) - c0[:2]
+        x0, y0 = c0[0], c0[1]
+        parity = np.zeros(nxy, np.uint8)
+        cells = 0
+        top = int(fzhi[col].max())
+        for cz in range(int(fzlo[col].min()), top + 1):
+            c0[2] = cz * _CHUNK
+            cdims = np.minimum(c0 + _CHUNK, dims) - c0
+            surf_ids = surf.get((cx * n[1] + cy) * n[2] + cz, empty)
+            fill_ids = col[(fzlo[col] <= cz) & (fzhi[col] >= cz)]
+            chunk = _voxelize_chunk(tris, origin, pitch, c0, cdims, surf_ids, fill_ids, parity)
+            if packed is not None:
+                w0 = c0[2] // 64
+                packed[x0:x0 + nxy[0], y0:y0 + nxy[1], w0:w0 + chunk.shape[2]] = chunk
+            cells += _popcount(chunk)
+
+        # 삼각형이 닿는 마지막 청크 위: 홀짝이 남은 열(열린 메쉬)은 격자 끝까지 내부
+        k1 = (top + 1) * _CHUNK
+        if k1 < dims[2] and parity.any():
+            cells += int(parity.sum()) * (int(dims[2]) - k1)
+            if packed is not None:
+                above = packed[x0:x0 + nxy[0], y0:y0 + nxy[1], k1 // 64:]
+                above[parity.astype(bool)] = _ALL_ONES
+                if dims[2] & 63:
+                    above[:, :, -1] &= (np.uint64(1) << np.uint64(dims[2] & 63)) - np.uint64(1)
+        return cells
+
+    # XY 청크 열끼리는 독립. numba / C++ 커널은 청크 내부에서 이미 병렬이고,
+    # AOT 커널은 GIL 을 잡으므로 열은 순서대로 처리
+    # (numba parallel 커널을 풀 스레드에서 부르면 TBB 스레딩 레이어에서 종료가 멈춤 → 메인 스레드에서 호출)
+    if voxel_raster or voxel_kernels or numba:
+        cells = sum(map(run, cols))
+    else:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            cells = sum(pool.map(run, cols))
+    return packed, origin, dims, cells * cell_vol
+
+def voxel_grid_to_pv(packed, dims, origin, pitch):
+    """점유 격자를 표시용 UnstructuredGrid (점유 셀만) 로 변환합니다."""
+    nx, ny, nz = (int(d) for d in dims)
+    grid = np.empty((nz, ny, nx), np.uint8)        # VTK 셀 순서 = x 가 가장 빠름
+    for i in range(packed.shape[0]):               # X 슬랩 단위로 풀어 임시 메모리를 작게 유지
+        grid[:, :, i] = unpack_voxels(packed[i:i + 1], nz)[0].T
+
+    # 격자를 복사 없이 VTK 배열로 감쌈 (threshold 가 점유 셀만 따로 복사)
+    img = _ImageData(dimensions=np.asarray(dims) + 1, spacing=(pitch,) * 3, origin=origin)
+    occupancy = numpy_to_vtk(grid.ravel(), deep=False)
+    occupancy.SetName("occupancy")
+    img.GetCellData().SetScalars(occupancy)
+    return img.threshold(0.5, scalars="occupancy")
 
 UNIT = {"mm3":1.0, "cm3":1/1_000, "m3":1/1_000_000_000}
 
+def print_bbox_volume(shape, scale, unit):
+    """Bounding box 는 sewing 결과가 나온 뒤, 요청된 경우에만 계산합니다."""
+    *minmax, bbox_mm3 = bbox_volume_mm3(shape)
+    print(f"[BBox] volume = {bbox_mm3*scale:.6f} {unit}")
+
 # ---------- main ----------
 def main():
     ap = argparse.ArgumentParser("Hybrid STEP volume")
@@ -108,41 +743,45 @@ def main():
     ap.add_argument("--pitch", type=float, default=0.5, help="Voxel pitch (mm)")
     ap.add_argument("--unit", choices=UNIT.keys(), default="cm3", help="Output unit")
     ap.add_argument("--show", action="store_true", help="Show mesh + voxels")
+    ap.add_argument("--gpu", action="store_true", help="Voxel inside test on GPU (CUDA via cupy, else off-screen rendering)")
     ap.add_argument("--bbox", action="store_true", help="Print bounding-box volume")
     args = ap.parse_args()
 
     if not os.path.exists(args.step):
         print("STEP file not found.", file=sys.stderr); sys.exit(1)
 
+    scale = UNIT[args.unit]         # 단위 환산 계수는 한 번만 조회
+
     print(f"[READ] {args.step}")
     shape = read_step_shape(args.step)
 
-    # Bounding box (optional)
-    if args.bbox:
-        *minmax, bbox_mm3 = bbox_volume_mm3(shape)
-        print(f"[BBox] volume = {bbox_mm3*UNIT[args.unit]:.6f} {args.unit}")
-
     # 1) 정확 시도
     print(f"[Sew] tol={args.tol} mm ...")
     solids = sewing_to_solids(shape, tol=args.tol)
     if solids:
-        infos, total = solids_volume(solids, UNIT[args.unit])
-        print(f"[OK] closed solids found = {len(infos)}")
-        for idx, v, com in infos:
-            print(f"  • Solid {idx}: {v:.6f} {args.unit} (COM {com})")
+        vols, coms, total = solids_volume(solids, scale, with_com=True)
+        print(f"[OK] closed solids found = {len(vols)}")
+        for idx, (v, com) in enumerate(zip(vols, coms.tolist())):
+            print(f"  • Solid {idx}: {v:.6f} {args.unit} (COM {tuple(com)})")
         print(f"  Σ Total: {total:.6f} {args.unit}")
+        if args.bbox:
+            print_bbox_volume(shape, scale, args.unit)
         return
 
     print("[WARN] No closed solid after sewing. Falling back to voxel...")
+    if args.bbox:
+        print_bbox_volume(shape, scale, args.unit)
 
     # 2) Voxel 근사
     mesh = shape_to_pv_mesh(shape)
-    vox, vol_mm3 = voxel_volume(mesh, args.pitch)
-    print(f"[Voxel] pitch={args.pitch} mm → {vol_mm3*UNIT[args.unit]:.6f} {args.unit}")
+    packed, origin, dims, vol_mm3 = voxel_volume(mesh, args.pitch, gpu=args.gpu,
+                                                 keep_grid=args.show)
+    print(f"[Voxel] pitch={args.pitch} mm → {vol_mm3*scale:.6f} {args.unit}")
 
     if args.show:
         p = pv.Plotter()
         p.add_mesh(mesh, color="lightgray", opacity=0.35, name="mesh")
+        vox = voxel_grid_to_pv(packed, dims, origin, args.pitch)
         p.add_mesh(vox, color="red", opacity=0.5, name="voxel")
         p.show()
 
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+cal_fine.py 의 numba 표면 셸 커널을 AOT (numba.pycc) 로 미리 컴파일합니다.
+
+    python voxel_kernels_build.py
+
+같은 디렉터리에 voxel_kernels 확장 모듈(.so / .pyd)이 생기며, numba 가 설치되지 않은
+실행 환경에서 cal_fine.py 가 NumPy 래스터라이저 대신 이를 사용합니다.
+AOT 모듈은 prange 병렬화가 적용되지 않아 한 스레드로 동작하므로, numba 가 있으면
+(cache=True 로 첫 실행 이후 컴파일이 없는) 병렬 JIT 커널이 우선합니다.
+numba.pycc 는 numba 에서 폐기 예정(NumbaPendingDeprecationWarning)입니다.
+"""
+
+import os
+from numba.pycc import CC
+
+import cal_fine
+
+cc = CC("voxel_kernels")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+# cal_fine._surface_voxels_nb 와 같은 인자: tris, lo, hi, order, offsets, origin, pitch, packed
+cc.export("surface_voxels",
+          "void(f8[:,:,:], i8[:,:], i8[:,:], i8[:], i8[:], f8[:], f8, u8[:,:,:])")(
+    cal_fine._surface_voxels_nb.py_func)
+
+if __name__ == "__main__":
+    cc.compile()
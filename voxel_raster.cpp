@@ -0,0 +1,155 @@
+// cal_fine.py 의 표면 셸 래스터화(triangle–box SAT) C++ 확장.
+//
+// 빌드 (결과 .so 를 cal_fine.py 옆에 두면 자동으로 사용됩니다):
+//   c++ -O3 -mavx2 -mfma -fopenmp -shared -fPIC $(python -m pybind11 --includes) voxel_raster.cpp -o voxel_raster$(python3-config --extension-suffix)
+//
+// 13축 SAT 에서 축 a 마다 [pmin - r, pmax + r] 구간을 삼각형별로 미리 구해 두면,
+// 셀 중심 c 의 판정은 "모든 축에서 a·c 가 구간 안" 이 됩니다.
+// AVX2 경로는 k 방향 연속 8셀을 한 번에 판정(FMA 13회 + 비교 26회)합니다.
+
+#include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+
+#ifdef __AVX2__
+#include <immintrin.h>
+#endif
+
+namespace py = pybind11;
+
+namespace {
+
+constexpr int kAxes = 13;
+
+struct TriAxes {
+    float ax[kAxes], ay[kAxes], az[kAxes];
+    float lo[kAxes], hi[kAxes];
+};
+
+// 삼각형 꼭짓점(격자 원점 기준)으로부터 13개 분리축과 허용 구간을 계산
+void build_axes(const float* v, float half, TriAxes& out) {
+    float e[3][3];
+    for (int m = 0; m < 3; ++m)
+        for (int d = 0; d < 3; ++d)
+            e[m][d] = v[((m + 1) % 3) * 3 + d] - v[m * 3 + d];
+
+    float axes[kAxes][3] = {{1, 0, 0}, {0, 1, 0}, {0, 0, 1}};
+    int n = 3;
+    for (int m = 0; m < 3; ++m) {               // e × x̂, e × ŷ, e × ẑ
+        axes[n][0] = 0;        axes[n][1] = -e[m][2]; axes[n][2] = e[m][1];  ++n;
+        axes[n][0] = e[m][2];  axes[n][1] = 0;        axes[n][2] = -e[m][0]; ++n;
+        axes[n][0] = -e[m][1]; axes[n][1] = e[m][0];  axes[n][2] = 0;        ++n;
+    }
+    axes[n][0] = e[0][1] * e[1][2] - e[0][2] * e[1][1];   // 평면 법선
+    axes[n][1] = e[0][2] * e[1][0] - e[0][0] * e[1][2];
+    axes[n][2] = e[0][0] * e[1][1] - e[0][1] * e[1][0];
+
+    for (int a = 0; a < kAxes; ++a) {
+        const float x = axes[a][0], y = axes[a][1], z = axes[a][2];
+        float pmin = INFINITY, pmax = -INFINITY;
+        for (int m = 0; m < 3; ++m) {
+            const float p = x * v[m * 3] + y * v[m * 3 + 1] + z * v[m * 3 + 2];
+            pmin = std::min(pmin, p);
+            pmax = std::max(pmax, p);
+        }
+        const float r = half * (std::fabs(x) + std::fabs(y) + std::fabs(z));
+        out.ax[a] = x; out.ay[a] = y; out.az[a] = z;
+        out.lo[a] = pmin - r;
+        out.hi[a] = pmax + r;
+    }
+}
+
+inline bool overlap_scalar(const TriAxes& t, float cx, float cy, float cz) {
+    for (int a = 0; a < kAxes; ++a) {
+        const float p = t.ax[a] * cx + t.ay[a] * cy + t.az[a] * cz;
+        if (p < t.lo[a] || p > t.hi[a]) return false;
+    }
+    return true;
+}
+
+#ifdef __AVX2__
+// 셀 중심 (cx, cy, cz[0..7]) 8개에 대한 겹침 여부 비트마스크
+inline int overlap_avx2(const TriAxes& t, float cx, float cy, __m256 cz) {
+    __m256 pass = _mm256_castsi256_ps(_mm256_set1_epi32(-1));
+    for (int a = 0; a < kAxes; ++a) {
+        const __m256 base = _mm256_set1_ps(t.ax[a] * cx + t.ay[a] * cy);
+        const __m256 p = _mm256_fmadd_ps(_mm256_set1_ps(t.az[a]), cz, base);
+        pass = _mm256_and_ps(pass, _mm256_cmp_ps(p, _mm256_set1_ps(t.lo[a]), _CMP_GE_OQ));
+        pass = _mm256_and_ps(pass, _mm256_cmp_ps(p, _mm256_set1_ps(t.hi[a]), _CMP_LE_OQ));
+        if (_mm256_testz_ps(pass, pass)) return 0;     // 8셀 모두 분리되면 조기 종료
+    }
+    return _mm256_movemask_ps(pass);
+}
+#endif
+
+void rasterize_triangles(
+        py::array_t<float, py::array::c_style | py::array::forcecast> tris,
+        py::array_t<int64_t, py::array::c_style | py::array::forcecast> lo,
+        py::array_t<int64_t, py::array::c_style | py::array::forcecast> hi,
+        py::array_t<int64_t, py::array::c_style | py::array::forcecast> order,
+        py::array_t<int64_t, py::array::c_style | py::array::forcecast> offsets,
+        double pitch,
+        double half_size,
+        py::array_t<uint64_t, py::array::c_style> packed) {
+    auto T = tris.unchecked<3>();
+    auto L = lo.unchecked<2>();
+    auto H = hi.unchecked<2>();
+    auto O = order.unchecked<1>();
+    auto R = offsets.unchecked<1>();
+    auto P = packed.mutable_unchecked<3>();
+
+    const int64_t nx = P.shape(0);
+    const float p = static_cast<float>(pitch);
+    const float half = static_cast<float>(half_size);
+
+    py::gil_scoped_release release;
+
+    // X 행 단위 병렬: 각 스레드가 packed[i] 를 혼자 쓰므로 워드 OR 에 경합 없음
+    #pragma omp parallel for schedule(dynamic)
+    for (int64_t i = 0; i < nx; ++i) {
+        const float cx = (static_cast<float>(i) + 0.5f) * p;
+        TriAxes axes;
+        for (int64_t n = R(i); n < R(i + 1); ++n) {
+            const int64_t t = O(n);
+            build_axes(T.data(t, 0, 0), half, axes);
+            const int64_t k0 = L(t, 2), k1 = H(t, 2);
+            for (int64_t j = L(t, 1); j <= H(t, 1); ++j) {
+                const float cy = (static_cast<float>(j) + 0.5f) * p;
+#ifdef __AVX2__
+                // 8셀 묶음은 8 의 배수에서 시작하므로 uint64 워드 경계를 넘지 않음
+                for (int64_t kb = k0 & ~int64_t(7); kb <= k1; kb += 8) {
+                    const float z = (static_cast<float>(kb) + 0.5f) * p;
+                    const __m256 cz = _mm256_add_ps(
+                        _mm256_set1_ps(z),
+                        _mm256_mul_ps(_mm256_set1_ps(p), _mm256_setr_ps(0, 1, 2, 3, 4, 5, 6, 7)));
+                    uint32_t mask = static_cast<uint32_t>(overlap_avx2(axes, cx, cy, cz));
+                    if (kb < k0) mask &= 0xFFu << (k0 - kb);
+                    if (kb + 7 > k1) mask &= 0xFFu >> (kb + 7 - k1);
+                    if (mask) P(i, j, kb >> 6) |= static_cast<uint64_t>(mask) << (kb & 63);
+                }
+#else
+                for (int64_t k = k0; k <= k1; ++k) {
+                    const float cz = (static_cast<float>(k) + 0.5f) * p;
+                    if (overlap_scalar(axes, cx, cy, cz))
+                        P(i, j, k >> 6) |= uint64_t(1) << (k & 63);
+                }
+#endif
+            }
+        }
+    }
+}
+
+}  // namespace
+
+PYBIND11_MODULE(voxel_raster, m) {
+    m.doc() = "Surface-shell voxel rasterizer (triangle-box SAT, OpenMP + AVX2)";
+    m.def("rasterize_triangles", &rasterize_triangles,
+          py::arg("tris"), py::arg("lo"), py::arg("hi"), py::arg("order"),
+          py::arg("offsets"), py::arg("pitch"), py::arg("half_size"), py::arg("packed"),
+          "tris: 격자 원점 기준 float32 (M, 3, 3), lo/hi: 셀 AABB (M, 3),\n"
+          "order/offsets: X 행별 삼각형 CSR, half_size: SAT 박스 반변,\n"
+          "packed: uint64 (nx, ny, ceil(nz/64))");
+}